@@ -25,6 +25,7 @@ import textwrap
 from absl import app
 from absl import flags
 from absl import logging
+from mathematics_dataset import example
 from mathematics_dataset import generate_settings
 from mathematics_dataset.modules import modules
 import six
@@ -136,8 +137,9 @@ def sample_from_module(module):
 
   Returns:
     Pair `(problem, num_dropped)`, where `problem` is an instance of `Problem`
-    and `num_dropped` is an integer >= 0 indicating the number of samples that
-    were dropped.
+    whose question and answer have already been converted to strings, and
+    `num_dropped` is an integer >= 0 indicating the number of samples that were
+    dropped.
   """
   num_dropped = 0
   while True:
@@ -154,7 +156,8 @@ def sample_from_module(module):
       if FLAGS.show_dropped:
         logging.warning('Dropping question with answer: %s', answer)
       continue
-    return problem, num_dropped
+    # Keep the rendered strings, so callers don't have to render them again.
+    return example.Problem(question=question, answer=answer), num_dropped
 
 
 def main(return_format = 'stdout', per_train_module = None, per_easy_train_module = None, per_medium_train_module = None, per_hard_train_module = None, per_test_module = None):
@@ -182,8 +185,8 @@ def main(return_format = 'stdout', per_train_module = None, per_easy_train_modul
         if return_format == 'dict':
           dataset_dict.update(
             {
-              'question': str(problem.question),
-              'answer': str(problem.answer)
+              'question': problem.question,
+              'answer': problem.answer
             }
           )
         elif return_format == 'stdout':
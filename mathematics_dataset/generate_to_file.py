@@ -28,31 +28,179 @@ answer.
 
 Passing --train_split=False will create a single output directory 'train' for
 training data.
+
+The output format is given by --save_format: 'json' (a list of question/answer
+records, the default), 'json_columns' (parallel lists of questions and
+answers), 'jsonl' (one record per line), or 'txt' (as described above).
+
+Passing --merge_modules (jsonl only) will instead write a single file per
+regime, e.g. 'train.jsonl', with each record also giving its module name.
+
+Passing --compress will gzip each output file, appending '.gz' to its name.
 """
 
 from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import contextlib
+import gzip
+import io
+import itertools
+import multiprocessing
 import os
+import random
 
 # Dependency imports
 from absl import app
 from absl import flags
 from absl import logging
 from mathematics_dataset import generate
-import six, json
+import numpy as np
+import orjson
 
 FLAGS = flags.FLAGS
 
+# Size of the write buffer for output files.
+_WRITE_BUFFER_SIZE = 2 * 1024 * 1024
+
+# Number of txt records to join together into a single write.
+_TXT_RECORDS_PER_WRITE = 32768
+
+# File extension for each supported save format.
+_EXTENSIONS = {
+    'json': '.json',
+    'json_columns': '.json',
+    'jsonl': '.jsonl',
+    'txt': '.txt',
+}
+
 flags.DEFINE_string('output_dir', None, 'Where to write output text')
 flags.DEFINE_boolean('train_split', True,
                      'Whether to split training data by difficulty')
+flags.DEFINE_enum('save_format', 'json', list(_EXTENSIONS),
+                  'Format of the output files')
+flags.DEFINE_integer('num_workers', None,
+                     'Number of worker processes; defaults to the CPU count')
+flags.DEFINE_boolean('compress', False,
+                     'Whether to gzip the output files')
+flags.DEFINE_boolean('merge_modules', False,
+                     'Whether to write all modules of a regime to one file '
+                     '(jsonl only)')
 
 flags.mark_flag_as_required('output_dir')
 
 
-def main(save_format = 'json'):
+def _init_worker(flag_values, run_seed):
+  """Inits the modules and reseeds the random state of a worker process.
+
+  Args:
+    flag_values: Dict of the parent's parsed flag values, from
+        `FLAGS.flag_values_dict()`.
+    run_seed: Integer in [0, 2**32), drawn once per run by the parent.
+  """
+  # Workers started with "spawn" or "forkserver" (rather than "fork") don't
+  # inherit the parsed flags, so copy over the parent's values.
+  if not FLAGS.is_parsed():
+    for name, value in flag_values.items():
+      if name in FLAGS:
+        FLAGS[name].value = value
+    FLAGS.mark_as_parsed()
+  # Forked workers inherit the parent's random state, so reseed to make sure
+  # they do not all generate the same questions. The pid separates workers
+  # within a run, and the run seed separates runs that reuse the same pids.
+  pid = os.getpid()
+  random.seed(run_seed * 2**32 + pid)
+  np.random.seed([run_seed, pid])
+  generate.init_modules()
+
+
+def _sample_one(regime_and_module_name):
+  """Returns a `(question, answer)` pair of strings for the given module."""
+  regime, module_name = regime_and_module_name
+  module = generate.filtered_modules[regime][module_name]
+  problem, _ = generate.sample_from_module(module)
+  return problem.question, problem.answer
+
+
+def _open_output(path):
+  """Opens `path` for binary writing, gzipped if `FLAGS.compress` is set."""
+  if FLAGS.compress:
+    # Level 1 is the fastest, and still gets most of the compression on the
+    # highly repetitive question text.
+    return io.BufferedWriter(
+        gzip.open(path, 'wb', compresslevel=1), _WRITE_BUFFER_SIZE)
+  return open(path, 'wb', buffering=_WRITE_BUFFER_SIZE)
+
+
+def _write_samples(output_file, save_format, samples, per_module,
+                   module_name=None):
+  """Writes the samples for a module to `output_file`.
+
+  Args:
+    output_file: Binary file object to write to.
+    save_format: One of the keys of `_EXTENSIONS`.
+    samples: Iterable of `per_module` pairs of strings `(question, answer)`.
+    per_module: Number of samples.
+    module_name: Optional module name to include in each record (jsonl only).
+  """
+  # Local aliases for the per-sample loops below.
+  write = output_file.write
+  dumps = orjson.dumps
+  if save_format == 'json':
+    # Stream the records out as they arrive, rather than holding the whole
+    # module's dataset in memory.
+    write(b'[')
+    for k, (question, answer) in enumerate(samples):
+      if k > 0:
+        write(b',')
+      write(dumps({'question': question, 'answer': answer}))
+    write(b']')
+  elif save_format == 'json_columns':
+    # Column-oriented: a single object holding parallel lists of questions and
+    # answers, which is smaller and faster to load.
+    questions = [None] * per_module
+    answers = [None] * per_module
+    for k, (question, answer) in enumerate(samples):
+      questions[k] = question
+      answers[k] = answer
+    write(dumps({'questions': questions, 'answers': answers}))
+  elif save_format == 'jsonl':
+    if module_name is None:
+      for question, answer in samples:
+        write(dumps({'question': question, 'answer': answer},
+                    option=orjson.OPT_APPEND_NEWLINE))
+    else:
+      for question, answer in samples:
+        write(dumps(
+            {'module': module_name, 'question': question, 'answer': answer},
+            option=orjson.OPT_APPEND_NEWLINE))
+  else:
+    chunks = []
+    append = chunks.append
+    for question, answer in samples:
+      append(f'{question}\n{answer}\n')
+      if len(chunks) >= _TXT_RECORDS_PER_WRITE:
+        write(''.join(chunks).encode('utf-8'))
+        chunks.clear()
+    if chunks:
+      write(''.join(chunks).encode('utf-8'))
+
+
+def _check_save_format(save_format, merge_modules):
+  """Raises `ValueError` if `save_format` is unsupported for the options."""
+  if save_format not in _EXTENSIONS:
+    raise ValueError(f'Unknown save format: {save_format}')
+  if merge_modules and save_format != 'jsonl':
+    raise ValueError(
+        f'--merge_modules is only supported for jsonl, not {save_format}')
+
+
+def main(save_format = None):
+  """Writes the generated examples; `save_format` defaults to the flag."""
+  if save_format is None:
+    save_format = FLAGS.save_format
+  _check_save_format(save_format, FLAGS.merge_modules)
   generate.init_modules()
 
   output_dir = os.path.expanduser(FLAGS.output_dir)
@@ -60,52 +208,60 @@ def main(save_format = 'json'):
     logging.info('output dir %s already exists', output_dir)
   logging.info('Writing to %s', output_dir)
   os.makedirs(output_dir, exist_ok=True)
-  for regime, flat_modules in six.iteritems(generate.filtered_modules):
-    regime_dir = os.path.join(output_dir, regime)
-    os.makedirs(regime_dir, exist_ok=True)
-    per_module = generate.counts[regime]
-    print(per_module)
-    for module_name, module in six.iteritems(flat_modules):
-      dataset_list = []
-      print(module_name,module)
-      if save_format == 'json':
-        path = os.path.join(regime_dir, module_name + '.json')
-        for k in range(per_module):
-          problem, _ = generate.sample_from_module(module)
-          dataset_list.append(
-            {
-              'question': str(problem.question),
-              'answer': str(problem.answer)
-            }
-          )
-          # print(problem.question)
-        with open(path, 'w', encoding= 'utf-8') as text_file:
-          json.dump(dataset_list, text_file, indent=4, )
-      elif save_format == 'jsonl':
-        path = os.path.join(regime_dir, module_name + '.jsonl')
-        with open(path, 'w', encoding= 'utf-8') as text_file:
-          for _ in range(per_module):
-            problem, _ = generate.sample_from_module(module)
-            data_item = {
-                'question': str(problem.question),
-                'answer': str(problem.answer)
-              }
-            json.dump(data_item, text_file)
-            text_file.write('\n')
-      elif save_format == 'txt':
-        path = os.path.join(regime_dir, module_name + '.txt')
-        with open(path, 'w') as text_file:
-          for _ in range(per_module):
-            problem, _ = generate.sample_from_module(module)
-            text_file.write(str(problem.question) + '\n')
-            text_file.write(str(problem.answer) + '\n')
+  num_workers = FLAGS.num_workers or multiprocessing.cpu_count()
+  jobs = []
+  for regime, flat_modules in generate.filtered_modules.items():
+    if not FLAGS.merge_modules:
+      os.makedirs(os.path.join(output_dir, regime), exist_ok=True)
+    jobs += [(regime, module_name) for module_name in flat_modules]
+
+  with multiprocessing.Pool(
+      num_workers, initializer=_init_worker,
+      initargs=(FLAGS.flag_values_dict(), random.getrandbits(32))) as pool, \
+       contextlib.ExitStack() as exit_stack:
+    # With --merge_modules, the open output file for each regime.
+    regime_files = {}
+
+    def submit(regime, module_name):
+      """Queues the samples for a module; returns an iterator over them."""
+      per_module = generate.counts[regime]
+      chunksize = max(1, per_module // (8 * num_workers))
+      # `itertools.repeat` saves building a list of `per_module` references
+      # here. Note the pool still reads the whole iterable into its task queue
+      # straight away, so this gives no back-pressure on submission.
+      return pool.imap_unordered(
+          _sample_one, itertools.repeat((regime, module_name), per_module),
+          chunksize)
+
+    next_samples = submit(*jobs[0]) if jobs else None
+    for job_index, (regime, module_name) in enumerate(jobs):
+      samples = next_samples
+      if job_index + 1 < len(jobs):
+        # Queue the next module before writing this one, so the workers stay
+        # busy across module boundaries instead of draining at each one.
+        next_samples = submit(*jobs[job_index + 1])
+      per_module = generate.counts[regime]
+      print(regime, module_name, per_module)
+      if FLAGS.merge_modules:
+        path = os.path.join(output_dir, regime + _EXTENSIONS[save_format])
+      else:
+        path = os.path.join(
+            output_dir, regime, module_name + _EXTENSIONS[save_format])
+      if FLAGS.compress:
+        path += '.gz'
+      if FLAGS.merge_modules:
+        if regime not in regime_files:
+          regime_files[regime] = exit_stack.enter_context(_open_output(path))
+        _write_samples(regime_files[regime], save_format, samples, per_module,
+                       module_name=module_name)
+        print(f'Appended {module_name} ({per_module} examples) to {path}')
       else:
-        raise ValueError(f'Unknown save format: {save_format}')
-      print(f'Wrote {path} with {per_module} examples')
-      
+        with _open_output(path) as output_file:
+          _write_samples(output_file, save_format, samples, per_module)
+        print(f'Wrote {path} with {per_module} examples')
 
 
 if __name__ == '__main__':
   import sys
   FLAGS(sys.argv)
-  main()
+  main(FLAGS.save_format)
@@ -0,0 +1,172 @@
+# Copyright 2018 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for mathematics_dataset.generate_to_file."""
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+import collections
+import io
+import json
+import os
+import tempfile
+from unittest import mock
+
+# Dependency imports
+from absl.testing import absltest
+from absl.testing import flagsaver
+from absl.testing import parameterized
+from mathematics_dataset import generate
+from mathematics_dataset import generate_to_file
+
+FLAGS = generate_to_file.FLAGS
+
+
+_SAMPLES = [
+    ('What is 1 + 1?', '2'),
+    ('Solve 2*x = 4 for x.', '2'),
+    ('What is "quoted" \\ here?', '-1/2'),
+]
+
+
+def _write(save_format, samples, module_name=None):
+  output_file = io.BytesIO()
+  generate_to_file._write_samples(
+      output_file, save_format, iter(samples), len(samples),
+      module_name=module_name)
+  return output_file.getvalue().decode('utf-8')
+
+
+class GenerateToFileTest(parameterized.TestCase):
+
+  def testJson(self):
+    records = json.loads(_write('json', _SAMPLES))
+    self.assertEqual(
+        [(record['question'], record['answer']) for record in records],
+        _SAMPLES)
+
+  def testJsonColumns(self):
+    columns = json.loads(_write('json_columns', _SAMPLES))
+    self.assertEqual(
+        list(zip(columns['questions'], columns['answers'])), _SAMPLES)
+
+  def testJsonl(self):
+    lines = _write('jsonl', _SAMPLES).splitlines()
+    records = [json.loads(line) for line in lines]
+    self.assertEqual(
+        records,
+        [{'question': question, 'answer': answer}
+         for question, answer in _SAMPLES])
+
+  def testJsonlWithModuleName(self):
+    lines = _write('jsonl', _SAMPLES, module_name='algebra__linear_1d')
+    records = [json.loads(line) for line in lines.splitlines()]
+    self.assertEqual(
+        records,
+        [{'module': 'algebra__linear_1d', 'question': question,
+          'answer': answer}
+         for question, answer in _SAMPLES])
+
+  def testTxtAcrossWriteBoundary(self):
+    samples = [('q{}'.format(i), str(i)) for i in range(7)]
+    output_file = io.BytesIO()
+    writes = []
+    original_write = output_file.write
+
+    def write(data):
+      writes.append(data)
+      return original_write(data)
+
+    output_file.write = write
+    with mock.patch.object(
+        generate_to_file, '_TXT_RECORDS_PER_WRITE', 3):
+      generate_to_file._write_samples(output_file, 'txt', iter(samples), 7)
+    self.assertLen(writes, 3)  # 3 + 3 + final 1
+    lines = output_file.getvalue().decode('utf-8').splitlines()
+    self.assertEqual(list(zip(lines[::2], lines[1::2])), samples)
+
+  def testEmpty(self):
+    self.assertEqual(json.loads(_write('json', [])), [])
+    self.assertEqual(
+        json.loads(_write('json_columns', [])),
+        {'questions': [], 'answers': []})
+    self.assertEqual(_write('jsonl', []), '')
+    self.assertEqual(_write('txt', []), '')
+
+  @parameterized.parameters('json', 'json_columns', 'txt')
+  def testMergeModulesRequiresJsonl(self, save_format):
+    generate_to_file._check_save_format(save_format, merge_modules=False)
+    with self.assertRaisesRegex(ValueError, 'only supported for jsonl'):
+      generate_to_file._check_save_format(save_format, merge_modules=True)
+
+  def testUnknownSaveFormat(self):
+    generate_to_file._check_save_format('jsonl', merge_modules=True)
+    with self.assertRaisesRegex(ValueError, 'Unknown save format'):
+      generate_to_file._check_save_format('csv', merge_modules=False)
+
+
+class MainTest(absltest.TestCase):
+
+  def setUp(self):
+    super(MainTest, self).setUp()
+    if not FLAGS.is_parsed():
+      FLAGS.mark_as_parsed()  # e.g., when run under pytest
+    self.output_dir = self.create_tempdir().full_path
+    # Initialize the modules afresh for the flags below, and restore afterwards.
+    self.enter_context(mock.patch.dict(generate.filtered_modules, clear=True))
+    self.enter_context(mock.patch.dict(generate.counts, clear=True))
+
+  def _main(self, main_args=('jsonl',), **flag_values):
+    with flagsaver.flagsaver(
+        output_dir=self.output_dir, filter='algebra__linear_1d',
+        per_train_module=4, per_test_module=2, num_workers=1, **flag_values):
+      generate_to_file.main(*main_args)
+
+  def _read_jsonl(self, *path):
+    with open(os.path.join(self.output_dir, *path)) as jsonl_file:
+      return [json.loads(line) for line in jsonl_file]
+
+  def testFilePerModule(self):
+    self._main(merge_modules=False)
+    self.assertCountEqual(
+        os.listdir(os.path.join(self.output_dir, 'train')),
+        ['algebra__linear_1d.jsonl', 'algebra__linear_1d_composed.jsonl'])
+    records = self._read_jsonl('train', 'algebra__linear_1d.jsonl')
+    self.assertLen(records, 4)
+    self.assertCountEqual(records[0], ['question', 'answer'])
+
+  def testMergeModules(self):
+    self._main(merge_modules=True)
+    self.assertCountEqual(
+        os.listdir(self.output_dir), ['train.jsonl', 'interpolate.jsonl'])
+    records = self._read_jsonl('train.jsonl')
+    self.assertEqual(
+        collections.Counter(record['module'] for record in records),
+        {'algebra__linear_1d': 4, 'algebra__linear_1d_composed': 4})
+    self.assertLen(self._read_jsonl('interpolate.jsonl'), 4)
+
+  def testSaveFormatFromFlags(self):
+    # As on the command line, with the format given only by --save_format.
+    self._main(main_args=(), save_format='jsonl', merge_modules=True)
+    self.assertCountEqual(
+        os.listdir(self.output_dir), ['train.jsonl', 'interpolate.jsonl'])
+    self.assertLen(self._read_jsonl('train.jsonl'), 8)
+
+
+if __name__ == '__main__':
+  # `--output_dir` is required by `generate_to_file`, but unused by the tests.
+  generate_to_file.FLAGS.set_default('output_dir', tempfile.gettempdir())
+  absltest.main()
@@ -18,7 +18,10 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import collections
+import fractions
 import functools
+import math
 import random
 
 # Dependency imports
@@ -45,6 +48,10 @@ _ENTROPY_EXTRAPOLATE = (12, 12)
 # for lowish degree polynomials.
 _POLY_PROBABILITY_REPEATED_ROOT = 0.2
 
+# Dirichlet concentration parameters of all ones, by length, to avoid
+# allocating them per sample.
+_ONES = {length: np.ones(length) for length in range(1, 8)}
+
 
 def _make_modules(entropy):
   """Returns modules given "difficulty" parameters."""
@@ -104,7 +111,7 @@ def _sample_roots(entropy):
 
   num_distinct = num_roots - num_repeated
 
-  entropies = entropy * np.random.dirichlet(np.ones(num_distinct))
+  entropies = entropy * np.random.dirichlet(_ONES[num_distinct])
 
   roots = []
 
@@ -124,6 +131,27 @@ def _sample_roots(entropy):
   return roots
 
 
+def _expand_roots(roots):
+  """Returns the coefficients of product_{root in roots} (x - root).
+
+  This multiplies in one linear factor at a time on plain python numbers, which
+  is exact and much faster than expanding the product symbolically in sympy.
+
+  Args:
+    roots: List of `int` or `fractions.Fraction`.
+
+  Returns:
+    List of coefficients `coeffs`, such that `coeffs[i]` is the coefficient of
+    x ** i.
+  """
+  coeffs = [1]
+  for root in roots:
+    coeffs = [0] + coeffs
+    for i in range(len(coeffs) - 1):
+      coeffs[i] -= root * coeffs[i + 1]
+  return coeffs
+
+
 def _polynomial_coeffs_with_roots(roots, scale_entropy):
   """Returns a polynomial with the given roots.
 
@@ -140,13 +168,23 @@ def _polynomial_coeffs_with_roots(roots, scale_entropy):
     List of coefficients `coeffs`, such that `coeffs[i]` is the coefficient of
     variable ** i.
   """
-  variable = sympy.Symbol('x')  # doesn't matter, only use coefficients
-  polynomial = sympy.Poly(sympy.prod([variable - root for root in roots]))
-  coeffs_reversed = polynomial.all_coeffs()
-  assert len(coeffs_reversed) == len(roots) + 1
-  coeffs = list(reversed(coeffs_reversed))
-  # Multiply terms to change rationals to integers, and then maybe reintroduce.
-  lcm = sympy.lcm([sympy.denom(coeff) for coeff in coeffs])
+  if all(isinstance(root, (int, sympy.Integer)) for root in roots):
+    # Common case; python ints are faster than fractions.
+    # (Float-based expansion, e.g. numpy's `polyfromroots`, would lose
+    # precision for the large roots sampled at high entropy.)
+    coeffs = _expand_roots([int(root) for root in roots])
+    lcm = 1
+  else:
+    coeffs = _expand_roots([
+        fractions.Fraction(int(sympy.numer(root)), int(sympy.denom(root)))
+        for root in roots])
+    # Multiply terms to change rationals to integers, and then maybe
+    # reintroduce.
+    lcm = functools.reduce(
+        lambda a, b: a * b // math.gcd(a, b),
+        [coeff.denominator for coeff in coeffs])
+  coeffs = [sympy.Integer(int(coeff * lcm)) for coeff in coeffs]
+  assert len(coeffs) == len(roots) + 1
   if scale_entropy > 0:
     while True:
       scale = number.integer_or_rational(scale_entropy, signed=True)
@@ -154,7 +192,56 @@ def _polynomial_coeffs_with_roots(roots, scale_entropy):
         break
   else:
     scale = 1
-  return [coeff * scale * lcm for coeff in coeffs]
+  return [coeff * scale for coeff in coeffs]
+
+
+def _factored_polynomial(roots, leading, variable):
+  """Returns the factored polynomial with the given roots.
+
+  This gives the same result as calling `sympy.factor` on the expanded
+  polynomial, but builds it directly from the known roots rather than
+  factorizing.
+
+  Args:
+    roots: List of integer or rational roots.
+    leading: The coefficient of the highest power of the polynomial.
+    variable: Variable of the polynomial.
+
+  Returns:
+    Sympy expression.
+  """
+  factors = []
+  for root, multiplicity in sorted(collections.Counter(roots).items()):
+    # (x - p/q) = (q*x - p) / q, which is primitive with positive leading term,
+    # as `sympy.factor` gives it.
+    numer, denom = sympy.numer(root), sympy.denom(root)
+    leading /= denom ** multiplicity
+    factors.append(sympy.Pow(denom * variable - numer, multiplicity))
+  factored = sympy.Mul(*factors)
+  if leading != 1:
+    # Keep the constant factored out, rather than letting sympy distribute it.
+    factored = sympy.Mul(
+        leading, *sympy.Mul.make_args(factored), evaluate=False)
+  return factored
+
+
+_POLY_ROOTS_SOLVE_TEMPLATES = (
+    'Let {equality}. What is {variable}?',
+    'Let {equality}. Calculate {variable}.',
+    'Suppose {equality}. What is {variable}?',
+    'Suppose {equality}. Calculate {variable}.',
+    'What is {variable} in {equality}?',
+    'Solve {equality} for {variable}.',
+    'Find {variable} such that {equality}.',
+    'Find {variable}, given that {equality}.',
+    'Determine {variable} so that {equality}.',
+    'Determine {variable}, given that {equality}.',
+    'Solve {equality}.',
+)
+
+_POLY_ROOTS_FACTOR_TEMPLATES = (
+    'Factor {expression}.',
+)
 
 
 def polynomial_roots(value, sample_args, context=None):
@@ -168,12 +255,17 @@ def polynomial_roots(value, sample_args, context=None):
   scale_entropy = min(entropy / 2, 1)
 
   roots = _sample_roots(entropy - scale_entropy)
-  solutions = sorted(list(sympy.FiniteSet(*roots)))
+  # The roots are all integers or rationals, so can be deduplicated and ordered
+  # directly, without building a sympy set.
+  solutions = sorted(set(roots))
   coeffs = _polynomial_coeffs_with_roots(roots, scale_entropy)
   (polynomial_entity,) = context.sample(
       sample_args, [composition.Polynomial(coeffs)])
 
-  if random.choice([False, True]):
+  # One draw picks both the kind of question (low bit) and, when asking for the
+  # roots, the template to use (remaining bits).
+  choice = random.randrange(2 * len(_POLY_ROOTS_SOLVE_TEMPLATES))
+  if choice & 1:
     # Ask for explicit roots.
     if len(solutions) == 1:
       answer = solutions[0]
@@ -186,19 +278,7 @@ def polynomial_roots(value, sample_args, context=None):
     else:
       variable = sympy.Symbol(context.pop())
       equality = ops.Eq(polynomial_entity.handle.apply(variable), 0)
-    template = random.choice([
-        'Let {equality}. What is {variable}?',
-        'Let {equality}. Calculate {variable}.',
-        'Suppose {equality}. What is {variable}?',
-        'Suppose {equality}. Calculate {variable}.',
-        'What is {variable} in {equality}?',
-        'Solve {equality} for {variable}.',
-        'Find {variable} such that {equality}.',
-        'Find {variable}, given that {equality}.',
-        'Determine {variable} so that {equality}.',
-        'Determine {variable}, given that {equality}.',
-        'Solve {equality}.'
-    ])
+    template = _POLY_ROOTS_SOLVE_TEMPLATES[choice >> 1]
     return example.Problem(
         question=example.question(
             context, template, equality=equality, variable=variable),
@@ -210,16 +290,18 @@ def polynomial_roots(value, sample_args, context=None):
     else:
       variable = sympy.Symbol(context.pop())
       expression = polynomial_entity.handle.apply(variable)
-    factored = sympy.factor(
-        polynomials.coefficients_to_polynomial(coeffs, variable))
-    template = random.choice([
-        'Factor {expression}.',
-    ])
+    factored = _factored_polynomial(roots, coeffs[-1], variable)
+    template = random.choice(_POLY_ROOTS_FACTOR_TEMPLATES)
     return example.Problem(
         question=example.question(context, template, expression=expression),
         answer=factored)
 
 
+_LINEAR_SYSTEM_TEMPLATES = (
+    'Solve {equations} for {variable}.',
+)
+
+
 def _solve_linear_system(degree, value, sample_args, context=None):
   """Solve linear equations."""
   is_question = context is None
@@ -235,7 +317,7 @@ def _solve_linear_system(degree, value, sample_args, context=None):
   extra_solutions_needed = degree - len(solutions)
   if extra_solutions_needed > 0:
     entropies = (entropy / 4) * np.random.dirichlet(
-        np.ones(extra_solutions_needed))
+        _ONES[extra_solutions_needed])
     entropies = np.maximum(1, entropies)  # min per-solution entropy
     entropy -= sum(entropies)
     solutions += [number.integer(solution_entropy, True)
@@ -262,12 +344,10 @@ def _solve_linear_system(degree, value, sample_args, context=None):
   variable = variables[solution_index]
   answer = solutions[solution_index]
 
-  equations = ', '.join([str(equation) for equation in equations])
+  equations = ', '.join(map(str, equations))
 
   if is_question:
-    template = random.choice([
-        'Solve {equations} for {variable}.',
-    ])
+    template = random.choice(_LINEAR_SYSTEM_TEMPLATES)
     return example.Problem(
         example.question(
             context, template, equations=equations,
@@ -310,6 +390,10 @@ class _PolynomialSequence(object):
         variable=self._variable, degree=self._degree,
         max_abs_input=self._degree + 2, entropy=entropy)
     self._sympy = polynomial.sympy()
+    # Coefficients as python ints, highest power first, for fast evaluation.
+    self._coeffs = tuple(
+        int(coeff)
+        for coeff in sympy.Poly(self._sympy, self._variable).all_coeffs())
 
   @property
   def min_num_terms(self):
@@ -328,7 +412,18 @@ class _PolynomialSequence(object):
 
   def term(self, n):
     """Returns the `n`th term of the sequence."""
-    return self._sympy.subs(self._variable, n)
+    # Horner's method; much cheaper than substituting into the sympy expression.
+    value = 0
+    for coeff in self._coeffs:
+      value = value * n + coeff
+    return sympy.Integer(value)
+
+
+_SEQ_NEXT_TEMPLATES = (
+    'What is next in {sequence}?',
+    'What comes next: {sequence}?',
+    'What is the next term in {sequence}?',
+)
 
 
 def sequence_next_term(min_entropy, max_entropy):
@@ -343,11 +438,7 @@ def sequence_next_term(min_entropy, max_entropy):
   sequence_sample = [sequence.term(n + 1) for n in range(num_terms)]
   sequence_sample = display.NumberList(sequence_sample)
 
-  template = random.choice([
-      'What is next in {sequence}?',
-      'What comes next: {sequence}?',
-      'What is the next term in {sequence}?',
-  ])
+  template = random.choice(_SEQ_NEXT_TEMPLATES)
   answer = sequence.term(num_terms + 1)
 
   return example.Problem(
@@ -355,6 +446,11 @@ def sequence_next_term(min_entropy, max_entropy):
       answer=answer)
 
 
+_SEQ_NTH_TEMPLATES = (
+    'What is the {variable}\'th term of {sequence}?',
+)
+
+
 def sequence_nth_term(min_entropy, max_entropy):
   """E.g., "What is the nth term in the sequence 1, 2, 3?"."""
   entropy = random.uniform(min_entropy, max_entropy)
@@ -367,9 +463,7 @@ def sequence_nth_term(min_entropy, max_entropy):
   sequence_sample = [sequence.term(n + 1) for n in range(num_terms)]
   sequence_sample = display.NumberList(sequence_sample)
 
-  template = random.choice([
-      'What is the {variable}\'th term of {sequence}?',
-  ])
+  template = random.choice(_SEQ_NTH_TEMPLATES)
   answer = sequence.sympy
 
   return example.Problem(
@@ -24,16 +24,35 @@ import random
 from absl.testing import absltest
 from mathematics_dataset.modules import algebra
 from mathematics_dataset.sample import polynomials
+import numpy as np
 
 import sympy
 
 
 class AlgebraTest(absltest.TestCase):
 
+  def testExpandRoots(self):
+    self.assertEqual(algebra._expand_roots([]), [1])
+    self.assertEqual(algebra._expand_roots([1, 2]), [2, -3, 1])
+    self.assertEqual(algebra._expand_roots([3, -2, 3]), [18, -3, -4, 1])
+
+  def testSampleRootsIsReproducible(self):
+    samples = []
+    for _ in range(2):
+      random.seed(0)
+      np.random.seed(0)
+      samples.append(algebra._sample_roots(entropy=8))
+    self.assertEqual(samples[0], samples[1])
+
   def testPolynomialCoeffsWithRoots(self):
     coeffs = algebra._polynomial_coeffs_with_roots([1, 2], scale_entropy=0.0)
     self.assertEqual(coeffs, [2, -3, 1])
 
+  def testPolynomialCoeffsWithRationalRoots(self):
+    coeffs = algebra._polynomial_coeffs_with_roots(
+        [sympy.Rational(1, 2), -2], scale_entropy=0.0)
+    self.assertEqual(coeffs, [-2, 3, 2])
+
   def testPolynomialRoots(self):
     variable = sympy.Symbol('x')
     for _ in range(10):
@@ -43,6 +62,24 @@ class AlgebraTest(absltest.TestCase):
       calc_roots = sympy.polys.polytools.real_roots(polynomial)
       self.assertEqual(calc_roots, sorted(roots))
 
+  def testFactoredPolynomial(self):
+    variable = sympy.Symbol('x')
+    for _ in range(20):
+      roots = algebra._sample_roots(entropy=6)
+      coeffs = algebra._polynomial_coeffs_with_roots(roots, scale_entropy=1.0)
+      factored = algebra._factored_polynomial(roots, coeffs[-1], variable)
+      expected = sympy.factor(
+          polynomials.coefficients_to_polynomial(coeffs, variable))
+      self.assertEqual(str(factored), str(expected))
+
+  def testPolynomialSequenceTerm(self):
+    variable = sympy.Symbol('n')
+    for _ in range(10):
+      sequence = algebra._PolynomialSequence(variable, entropy=5)
+      for n in range(1, 6):
+        self.assertEqual(
+            sequence.term(n), sequence.sympy.subs(variable, n))
+
 
 if __name__ == '__main__':
   absltest.main()
@@ -18,6 +18,7 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
 import math
 import random
 
@@ -483,6 +484,28 @@ def sample_with_brackets(variables, degrees, entropy, length=None):
   return _sample_with_brackets(0, variables, degrees, entropy, length, True)
 
 
+@functools.lru_cache(maxsize=None)
+def _small_evaluation_entropy_deltas(degree, max_abs_input):
+  """Returns the per-power entropy adjustments for a bounded evaluation.
+
+  These only depend on the degree and the input bound (and not on any
+  randomness), so are computed once and shared across samples.
+
+  Args:
+    degree: Degree of polynomial.
+    max_abs_input: Number >= 1; max absolute value of input.
+
+  Returns:
+    Tuple of length `degree + 1`, with the entropy to add to the coefficient of
+    each power.
+  """
+  log_max_abs_input = math.log10(max_abs_input)
+  # This scaling guarantees that the terms give roughly equal contribution to
+  # the typical magnitude of the polynomial when |input| <= max_abs_input.
+  return tuple(0.5 * (degree - 2 * power) * log_max_abs_input
+               for power in range(degree + 1))
+
+
 def sample_with_small_evaluation(variable, degree, max_abs_input, entropy):
   """Generates a (canonically ordered) polynomial, with bounded evaluation.
 
@@ -501,13 +524,11 @@ def sample_with_small_evaluation(variable, degree, max_abs_input, entropy):
   """
   assert max_abs_input >= 1
   entropies = entropy * np.random.dirichlet(np.ones(degree + 1))
+  deltas = _small_evaluation_entropy_deltas(degree, max_abs_input)
   coeffs = []
 
   for power in range(degree + 1):
-    # This scaling guarantees that the terms give roughly equal contribution
-    # to the typical magnitude of the polynomial when |input| <= max_abs_input.
-    delta = 0.5 * (degree - 2 * power) * math.log10(max_abs_input)
-    power_entropy = entropies[power] + delta
+    power_entropy = entropies[power] + deltas[power]
     min_abs = 1 if power == degree else 0
     coeff = number.integer(power_entropy, signed=True, min_abs=min_abs)
     coeffs.append(coeff)
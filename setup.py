@@ -46,6 +46,7 @@ setup(
     install_requires=[
         'absl-py>=0.1.0',
         'numpy>=1.10',
+        'orjson',
         'six',
         'sympy>=1.2',
     ],